@@ -0,0 +1,67 @@
+import ctypes
+
+import numpy as np
+import rebound
+
+from fragRebSim import funcs
+from fragRebSim.forces import sim_constants as sc
+
+
+# Fragments at random directions, radii log-uniform from well inside the
+# nuclear cluster (r < 10 rc) to well outside the halo scale radius.
+def make_sim(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    r = 10.0**rng.uniform(3.0, 11.0, n)
+    r[:5] = 10.0 * sc.rc * np.array([0.9, 0.99, 1.0, 1.01, 1.1])
+    u1 = rng.uniform(-1.0, 1.0, n)
+    th = rng.uniform(0.0, 2.0 * np.pi, n)
+    reb_sim = rebound.Simulation()
+    reb_sim.add(m=sc.m_hole)
+    for ri, ui, ti in zip(r, u1, th):
+        reb_sim.add(m=0.0, x=ri * np.sqrt(1.0 - ui**2) * np.cos(ti),
+                    y=ri * np.sqrt(1.0 - ui**2) * np.sin(ti), z=ri * ui)
+    return reb_sim
+
+
+def accelerations(reb_sim, apply):
+    ps = funcs.particle_array(reb_sim)
+    ps['ax'] = 0.0
+    ps['ay'] = 0.0
+    ps['az'] = 0.0
+    apply(reb_sim)
+    ps = funcs.particle_array(reb_sim)[1:]
+    return np.stack([ps['ax'], ps['ay'], ps['az']])
+
+
+def numpy_accel(reb_sim):
+    kernel = funcs.accel
+    funcs.accel = None
+    try:
+        funcs.add_galactic_accel(funcs.particle_array(reb_sim)[1:])
+    finally:
+        funcs.accel = kernel
+
+
+# forces.py, _kernels.py and _potential.c implement the same force law;
+# check that every available backend agrees with the NumPy one.
+def test_force_parity():
+    reb_sim = make_sim()
+    expected = accelerations(reb_sim, numpy_accel)
+    assert np.all(np.isfinite(expected))
+
+    if funcs.accel is not None:
+        got = accelerations(reb_sim, lambda s: funcs.add_galactic_accel(
+            funcs.particle_array(s)[1:]))
+        assert np.allclose(got, expected, rtol=1e-9, atol=0.0)
+
+    c_accel = funcs.c_migration_accel()
+    if c_accel is not None:
+        migration_accel = ctypes.CFUNCTYPE(None, ctypes.c_void_p)(c_accel)
+        got = accelerations(
+            reb_sim, lambda s: migration_accel(ctypes.addressof(s)))
+        assert np.allclose(got, expected, rtol=1e-9, atol=0.0)
+
+
+if __name__ == '__main__':
+    test_force_parity()
+    print('Force backends agree.')
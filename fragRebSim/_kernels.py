@@ -0,0 +1,36 @@
+from math import atan, log1p, pi, sqrt
+
+from numba import njit
+
+
+# Galactic acceleration of every fragment, fused into a single compiled
+# loop. Mirrors bulge_force, disk_force and halo_force from forces.py;
+# the potential parameters are passed in so the kernel stays independent
+# of sim_constants.
+@njit(cache=True, fastmath=True)
+def accel(x, y, z, ax, ay, az,
+          m_bulge, ab, m_disk, ad, bd, m_halo, r_halo, rc, sf2):
+    for i in range(x.size):
+        x2 = x[i] * x[i]
+        y2 = y[i] * y[i]
+        z2 = z[i] * z[i]
+        r2 = x2 + y2 + z2
+        r = sqrt(r2)
+        rho2 = x2 + y2
+        zbd = sqrt(z2 + bd * bd)
+
+        # Bulge
+        coef = -m_bulge / (r2 * (ab + r))
+
+        # Disk
+        d2 = rho2 + (ad + zbd) * (ad + zbd)
+        coef -= m_disk / (d2 * sqrt(d2))
+
+        # Halo, smoothly switched off inside the nuclear cluster
+        halo_scale = atan((r - 10.0 * rc) / sf2) / pi + 0.5
+        coef -= halo_scale * m_halo * (log1p(r / r_halo) / (r2 * r) -
+                                       1.0 / ((r + r_halo) * r2))
+
+        ax[i] += coef * x[i]
+        ay[i] += coef * y[i]
+        az[i] += coef * z[i]
@@ -0,0 +1,78 @@
+/* Galactic potential from forces.py as a REBOUND additional_forces
+ * callback, so IAS15 can evaluate it without calling back into Python.
+ *
+ * Build next to this file with
+ *     cc -O3 -shared -fPIC -o _potential.so _potential.c -lm
+ *
+ * rebound.h is not needed: the offsets of the simulation fields used here
+ * are read from rebound's ctypes definitions and handed over through
+ * set_layout, so one build works with any installed REBOUND version. */
+#include <math.h>
+#include <stddef.h>
+
+/* Leading fields of struct reb_particle */
+struct particle_head {
+    double x, y, z;
+    double vx, vy, vz;
+    double ax, ay, az;
+};
+
+static size_t N_offset, N_size, particles_offset, particle_size;
+static double m_bulge, ab, m_disk, ad, bd, m_halo, r_halo, rc, sf2;
+
+void set_layout(size_t n_offset, size_t n_size, size_t p_offset,
+                size_t p_size) {
+    N_offset = n_offset;
+    N_size = n_size;
+    particles_offset = p_offset;
+    particle_size = p_size;
+}
+
+void set_constants(double m_bulge_, double ab_, double m_disk_, double ad_,
+                   double bd_, double m_halo_, double r_halo_, double rc_,
+                   double sf2_) {
+    m_bulge = m_bulge_;
+    ab = ab_;
+    m_disk = m_disk_;
+    ad = ad_;
+    bd = bd_;
+    m_halo = m_halo_;
+    r_halo = r_halo_;
+    rc = rc_;
+    sf2 = sf2_;
+}
+
+void migration_accel(void* sim) {
+    char* s = (char*)sim;
+    size_t N = (N_size == sizeof(int)) ? (size_t)*(int*)(s + N_offset)
+                                       : *(size_t*)(s + N_offset);
+    char* ps = *(char**)(s + particles_offset);
+
+    /* Particle 0 is the black hole */
+    for (size_t i = 1; i < N; i++) {
+        struct particle_head* p = (struct particle_head*)(ps + i * particle_size);
+        double x2 = p->x * p->x;
+        double y2 = p->y * p->y;
+        double z2 = p->z * p->z;
+        double r2 = x2 + y2 + z2;
+        double r = sqrt(r2);
+        double rho2 = x2 + y2;
+        double zbd = sqrt(z2 + bd * bd);
+
+        /* Bulge */
+        double coef = -m_bulge / (r2 * (ab + r));
+
+        /* Disk */
+        double d2 = rho2 + (ad + zbd) * (ad + zbd);
+        coef -= m_disk / (d2 * sqrt(d2));
+
+        /* Halo, smoothly switched off inside the nuclear cluster */
+        double halo_scale = atan((r - 10.0 * rc) / sf2) / M_PI + 0.5;
+        coef -= halo_scale * m_halo * (log1p(r / r_halo) / (r2 * r) -
+                                       1.0 / ((r + r_halo) * r2));
+
+        p->ax += coef * p->x;
+        p->ay += coef * p->y;
+        p->az += coef * p->z;
+    }
+}
@@ -15,62 +15,46 @@ class dMdEdist():
         rel_path = "dmde_values/*.dat"
         abs_file_path = os.path.join(script_dir, rel_path)
 
-        for file in glob.glob(abs_file_path):
-            self.betas.append(float(file.split('/')[-1].split('_')[0]))
-            with open(file, 'r') as f:
-                a = []
-                b = []
-                x = []
-                y = []
-                for i, line in enumerate(f):
-                    if i == 1:
-                        self.masses.append(float(line.split()[0]) / 2.0)
-                    elif i == 3:
-                        a = [float(string) for string in line.split()]
-                    elif i == 4:
-                        b = [float(string) for string in line.split()]
-                    else:
-                        continue
-
-                for i, point in enumerate(a):
-                    if point > 0:
-                        x.append(a[i])
-                        y.append(b[i])
-
-                n = len(x)
-                step = 10
-                s = []
-                p_s = []
-
-                # For smoothing!
-                nbins = int(n/step)
-                for i in range(nbins):
-                    xsum = sum(x[step * i:(step * i) + step - 1])
-                    s_point = xsum / float(step)
-                    s.append(s_point)
-
-                    ysum = sum(y[step * i:(step * i) + step - 1])
-                    p_s_point = ysum / float(step)
-                    p_s.append(p_s_point)
-                s.append(0.0)
-                p_s.append(0.0)
-                s = s[::-1]
-                p_s = p_s[::-1]
-
-                CDE = np.cumsum(p_s) / max(np.cumsum(p_s))
-                f = interp1d(CDE, s)
-                self.functions.append(f)
+        # Tables sorted by beta, so self.betas is monotonic
+        tables = sorted((float(os.path.basename(file).split('_')[0]), file)
+                        for file in glob.glob(abs_file_path))
+
+        for beta, file in tables:
+            self.betas.append(beta)
+            # Line 1 holds the mass, lines 3 and 4 the energies and dM/dE
+            meta = np.loadtxt(file, skiprows=1, max_rows=1, ndmin=1)
+            self.masses.append(float(meta[0]) / 2.0)
+            a = np.loadtxt(file, skiprows=3, max_rows=1)
+            b = np.loadtxt(file, skiprows=4, max_rows=1)
+
+            mask = a > 0
+            x = a[mask]
+            y = b[mask]
+
+            # For smoothing! Average over bins of step points
+            step = 10
+            m = (len(x) // step) * step
+            s = x[:m].reshape(-1, step).mean(axis=1)[::-1]
+            p_s = y[:m].reshape(-1, step).mean(axis=1)[::-1]
+            s = np.concatenate([[0.0], s])
+            p_s = np.concatenate([[0.0], p_s])
+
+            c = np.cumsum(p_s)
+            CDE = c / c[-1]
+            f = interp1d(CDE, s)
+            self.functions.append(f)
+
+        self.betas_arr = np.asarray(self.betas)
 
     def beta_mass_interp(self):
         f = interp1d(self.betas, self.masses)
         return f
 
-    def beta_interp(self, beta):
-        diffs = np.array([np.absolute(b - beta) for b in self.betas])
-        [i, j] = diffs.argsort()[:2]
-
-        x1 = self.betas[i]
-        x2 = self.betas[j]
+    # Energies of nfrag equal-mass fragments, interpolated between the
+    # dM/dE distributions of the two tabulated betas closest to beta
+    def energy_spread(self, beta, nfrag):
+        diffs = np.abs(self.betas_arr - beta)
+        i, j = np.argpartition(diffs, 1)[:2]
 
         f1 = self.functions[i]
         f2 = self.functions[j]
@@ -82,17 +66,9 @@ class dMdEdist():
         p2 = d1 / d
         p1 = d2 / d
 
-        def f_new(x):
-            return p1 * f1(x) + p2 * f2(x)
-
-        l = [f_new, x1, x2]
-        return l
-
-    def energy_spread(self, beta, nfrag):
-        [beta_func, x1, x2] = self.beta_interp(beta)
         bin_size = 1.0 / nfrag
         half = bin_size * 0.5
         x_set = np.linspace(half, 1.0 - half, nfrag)
-        return beta_func(x_set)
+        return p1 * f1(x_set) + p2 * f2(x_set)
 
 # print('dMdE dist file imported')
@@ -1,5 +1,4 @@
 from astropy import units as u
-from math import atan
 import numpy as np
 
 
@@ -26,24 +25,49 @@ class sim_constants():
     AUtoRsun = (1.0 * u.AU).to('Rsun').value  # 1 AU converted to Rsun
     RsuntoAU = (1.0 * u.Rsun).to('AU').value  # 1 Rsun converted to AU
 
+    # Velocity conversions to natural units, AU / (yr / 2 pi)
+    natural_v = u.AU / (u.yr / (2.0 * np.pi))
+    kmstonatural = (1.0 * u.km / u.second).to(natural_v).value
+    cgsv2tonatural = (1.0 * (u.cm / u.second)**2).to(natural_v**2).value
+
     # Constants for smoothing functions
     sf1 = 1.0e8
     sf2 = 1.0e4
 
 
+# Module-level copies of the potential parameters, so the force functions
+# below avoid a class attribute lookup per term. These are read once at
+# import; changing sim_constants afterwards does not affect them.
+M_BULGE = sim_constants.m_bulge
+M_DISK = sim_constants.m_disk
+M_HALO = sim_constants.m_halo
+R_HALO = sim_constants.r_halo
+AB = sim_constants.ab
+AD = sim_constants.ad
+BD = sim_constants.bd
+RC = sim_constants.rc
+SF1 = sim_constants.sf1
+SF2 = sim_constants.sf2
+
+
 def smoothing_func(r):
-    return ((1.0 / np.pi) * atan((r - sim_constants.sf1) /
-            sim_constants.sf2) + 0.5)
+    return ((1.0 / np.pi) * np.arctan((r - SF1) / SF2) + 0.5)
     # smoothing function is necessary
     # for integrator to handle logterm
 
 
+def halo_scale(r):
+    return ((1.0 / np.pi) * np.arctan((r - 10.0 * RC) / SF2) + 0.5)
+    # smoothly switches the halo off inside the nuclear cluster,
+    # keeps the force continuous for the integrator
+
+
 def logterm(r):
-    return np.log(1.0 + (r / sim_constants.r_halo))
+    return np.log1p(r / R_HALO)
 
 
 def rterm(r):
-    return (r + sim_constants.r_halo) * (r**2)
+    return (r + R_HALO) * (r**2)
 
 
 # For now, cluster_force is unnecessary
@@ -57,21 +81,18 @@ def cluster_force(r, coord):
 
 def bulge_force(r, coord):
     # return 0
-    return -sim_constants.m_bulge * coord / ((r**2) * (sim_constants.ab + r))
+    return -M_BULGE * coord / ((r**2) * (AB + r))
     # return -sim_constants.m_bulge * coord / (r * (sim_constants.ab + r)**2)
 
 
 def disk_force(r, coord, rho2, zbd):
     # return 0
-    return (-sim_constants.m_disk * coord /
-            (rho2 + (sim_constants.ad + zbd)**2)**1.5)
+    return -M_DISK * coord / (rho2 + (AD + zbd)**2)**1.5
 
 
 def halo_force(r, coord):
     # return 0
-    if r < 10*sim_constants.rc:
-        halo_scale = 0
-    else:
-        halo_scale = 1
-    return (-halo_scale * sim_constants.m_halo * coord *
-            ((logterm(r) / r**3) - (1.0 / rterm(r))))
+    # logterm(r) / r**3 - 1 / rterm(r), fused
+    r2 = r * r
+    return (-halo_scale(r) * M_HALO * coord *
+            (np.log1p(r / R_HALO) / (r2 * r) - 1.0 / ((r + R_HALO) * r2)))
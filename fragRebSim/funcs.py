@@ -1,4 +1,17 @@
+import ctypes
+import os
+
+import numpy as np
+import rebound
+
 from .forces import sim_constants
+from .forces import bulge_force, cluster_force, disk_force, halo_force
+from .forces import AB, AD, BD, M_BULGE, M_DISK, M_HALO, R_HALO, RC, SF2
+
+try:
+    from ._kernels import accel
+except ImportError:  # numba not installed, use the NumPy force functions
+    accel = None
 
 
 # Randomly draw stellar mass, derived from Salpeter's mass function:
@@ -32,3 +45,94 @@ def beta_dist(y):
 # Tidal radius for a star
 def r_tidal(m_star, r_star):
     return r_star * (sim_constants.m_hole / m_star)**(1.0 / 3.0)
+
+
+# NumPy dtype mirroring the floating point fields of REBOUND's
+# struct reb_particle. Offsets and itemsize are taken from the ctypes
+# definition so the layout matches whichever REBOUND version is installed.
+def _particle_dtype():
+    fields = [(name, getattr(rebound.Particle, name).offset)
+              for name, ctype in rebound.Particle._fields_
+              if ctype is ctypes.c_double]
+    return np.dtype({'names': [name for name, offset in fields],
+                     'formats': ['f8'] * len(fields),
+                     'offsets': [offset for name, offset in fields],
+                     'itemsize': ctypes.sizeof(rebound.Particle)})
+
+
+particle_dtype = _particle_dtype()
+
+
+# Structured array view over the particles of a rebound simulation.
+# Writes to the view (e.g. to the 'ax' field) go straight into REBOUND's
+# particle buffer. The view is invalidated whenever particles are added
+# or removed, so it should be rebuilt rather than stored.
+def particle_array(reb_sim):
+    nbytes = reb_sim.N * particle_dtype.itemsize
+    addr = ctypes.addressof(reb_sim._particles.contents)
+    buf = (ctypes.c_char * nbytes).from_address(addr)
+    return np.frombuffer(buf, dtype=particle_dtype)
+
+
+# Add the galactic acceleration to every particle of a particle_array view.
+def add_galactic_accel(ps):
+    if accel is not None:
+        accel(ps['x'], ps['y'], ps['z'], ps['ax'], ps['ay'], ps['az'],
+              M_BULGE, AB, M_DISK, AD, BD, M_HALO, R_HALO, RC, SF2)
+        return
+
+    x = ps['x']
+    y = ps['y']
+    z = ps['z']
+    x2 = x**2
+    y2 = y**2
+    z2 = z**2
+    r = np.sqrt(x2 + y2 + z2)
+    rho2 = x2 + y2
+    zbd = np.sqrt(z2 + BD**2)
+
+    ps['ax'] += cluster_force(r, x) + bulge_force(r, x) +\
+        disk_force(r, x, rho2, zbd) + halo_force(r, x)
+    ps['ay'] += cluster_force(r, y) + bulge_force(r, y) +\
+        disk_force(r, y, rho2, zbd) + halo_force(r, y)
+    ps['az'] += cluster_force(r, z) + bulge_force(r, z) +\
+        disk_force(r, z, rho2, zbd) + halo_force(r, z)
+
+
+# Name of the implementation add_galactic_accel uses.
+def galactic_accel_backend():
+    return 'numba' if accel is not None else 'NumPy'
+
+
+_potential_lib = None
+
+
+# Address of the migration_accel callback in the compiled galactic
+# potential (see _potential.c), ready to be assigned to
+# reb_sim.additional_forces. Returns None if the library has not been
+# built or the installed REBOUND lays out its particles differently.
+def c_migration_accel():
+    global _potential_lib
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        '_potential.so')
+    if not os.path.exists(path):
+        return None
+
+    # _potential.c only knows the leading x, ..., az fields of a particle
+    head = ['x', 'y', 'z', 'vx', 'vy', 'vz', 'ax', 'ay', 'az']
+    if [getattr(rebound.Particle, name).offset for name in head] != \
+            [8 * i for i in range(len(head))]:
+        return None
+
+    if _potential_lib is None:
+        lib = ctypes.CDLL(path)
+        lib.set_layout.argtypes = [ctypes.c_size_t] * 4
+        lib.set_layout(rebound.Simulation.N.offset,
+                       rebound.Simulation.N.size,
+                       rebound.Simulation._particles.offset,
+                       ctypes.sizeof(rebound.Particle))
+        lib.set_constants.argtypes = [ctypes.c_double] * 9
+        lib.set_constants(M_BULGE, AB, M_DISK, AD, BD, M_HALO, R_HALO, RC,
+                          SF2)
+        _potential_lib = lib
+    return ctypes.cast(_potential_lib.migration_accel, ctypes.c_void_p).value
@@ -5,15 +5,14 @@ from math import cos, sin, sqrt
 # These modules need to be pip installed.
 import numpy as np
 import rebound
-from astropy import units as u
 # For Jupyter/IPython notebook
 from tqdm import tnrange
 
 # From fragRebSim
 from .dMdEdist import dMdEdist
 from .forces import sim_constants as sc
-from .forces import bulge_force, cluster_force, disk_force, halo_force
-from .funcs import beta_dist, mstar_dist, r_tidal, rstar_func
+from .funcs import (add_galactic_accel, beta_dist, mstar_dist,
+                    particle_array, r_tidal, rstar_func)
 
 
 class RebSimIntegrator:
@@ -43,20 +42,7 @@ class RebSimIntegrator:
     # Note: There is a typo in that paper where "a_d" is said to be
     # 2750 kpc, it should be 2.75 kpc.
     def migrationAccel(self, reb_sim):
-        ps = reb_sim.contents.particles
-        x2 = ps[1].x**2
-        y2 = ps[1].y**2
-        z2 = ps[1].z**2
-        r = sqrt(x2 + y2 + z2)
-        rho2 = x2 + y2
-        zbd = sqrt(z2 + sc.bd**2)
-
-        ps[1].ax += cluster_force(r, ps[1].x) + bulge_force(r, ps[1].x) +\
-            disk_force(r, ps[1].x, rho2, zbd) + halo_force(r, ps[1].x)
-        ps[1].ay += cluster_force(r, ps[1].y) + bulge_force(r, ps[1].y) +\
-            disk_force(r, ps[1].y, rho2, zbd) + halo_force(r, ps[1].y)
-        ps[1].az += cluster_force(r, ps[1].z) + bulge_force(r, ps[1].z) +\
-            disk_force(r, ps[1].z, rho2, zbd) + halo_force(r, ps[1].z)
+        add_galactic_accel(particle_array(reb_sim.contents)[1:])
 
     def sim_integrate(self):
         m_hole = sc.m_hole
@@ -97,13 +83,9 @@ class RebSimIntegrator:
             NRGs = self.dmde.energy_spread(beta, self.Nfrag)
 
             # Converted NRGs list from cgs to proper units
-            pi = np.pi
-            natural_u = (u.AU / (u.yr / (2.0 * pi)))**2
             nrg_scale = ((r_star * sc.AUtoRsun)**(-1.0) * (m_star)**(2.0 / 3.0)
                          * (m_hole / 1.0e6)**(1.0 / 3.0))
-            energies = [(nrg_scale * nrg *
-                         (u.cm / u.second)**2).to(natural_u).value
-                        for nrg in NRGs]
+            energies = nrg_scale * sc.cgsv2tonatural * np.asarray(NRGs)
 
             # Calculating velocities
             vels = [sqrt((2.0 * g) + (2 * m_hole / r_t)) for g in energies]
@@ -114,19 +96,19 @@ class RebSimIntegrator:
             x = star_vec[0]
             y = star_vec[1]
             z = star_vec[2]
-            r = np.linalg.norm(star_vec)
-
-            randomvelvec = [
-                (x * (r - z + z * cos(phi2)) - r * y * sin(phi2)) /
-                (r**2 * sqrt(2.0 - 2.0 * z / r)),
-                (y * (r - z + z * cos(phi2)) + r * x * sin(phi2)) /
-                (r**2 * sqrt(2.0 - 2.0 * z / r)),
-                ((r - z) * z - (x**2 + y**2) * cos(phi2)) /
-                (r**2 * sqrt(2.0 - 2.0 * z / r))
-            ]
-
-            velocity_vec = np.cross(star_vec, randomvelvec)
-            n = np.linalg.norm(velocity_vec)
+            r = sqrt(x * x + y * y + z * z)
+
+            norm = r**2 * sqrt(2.0 - 2.0 * z / r)
+            rvx = (x * (r - z + z * cos(phi2)) - r * y * sin(phi2)) / norm
+            rvy = (y * (r - z + z * cos(phi2)) + r * x * sin(phi2)) / norm
+            rvz = ((r - z) * z - (x**2 + y**2) * cos(phi2)) / norm
+
+            # Cross product of the star position and the random vector
+            vx = y * rvz - z * rvy
+            vy = z * rvx - x * rvz
+            vz = x * rvy - y * rvx
+            n = sqrt(vx * vx + vy * vy + vz * vz)
+            velocity_vec = [vx, vy, vz]
 
             for fi, frag in enumerate(tnrange(self.Nfrag,
                                               desc='Fragment', leave=False)):
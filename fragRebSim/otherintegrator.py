@@ -6,15 +6,15 @@ from math import cos, sin, sqrt
 # These modules need to be pip installed.
 import numpy as np
 import rebound
-from astropy import units as u
 # For Jupyter/IPython notebook
-from tqdm import tnrange, tqdm
+from tqdm import tqdm
 
 # From fragRebSim
 from .dMdEdist import dMdEdist
 from .forces import sim_constants as sc
-from .forces import bulge_force, cluster_force, disk_force, halo_force
-from .funcs import beta_dist, mstar_dist, r_tidal, rstar_func
+from .funcs import (add_galactic_accel, beta_dist, c_migration_accel,
+                    galactic_accel_backend, mstar_dist, particle_array,
+                    particle_dtype, r_tidal, rstar_func)
 
 
 class RebSimIntegrator:
@@ -24,9 +24,19 @@ class RebSimIntegrator:
         self.Nfrag = Nfrag
         self.Nout = 10000
         self.max_time = 1.0e6 * 2.0 * np.pi
-        self.posx = [[[] for y in range(Nfrag)] for x in range(Nstars)]
-        self.posy = [[[] for y in range(Nfrag)] for x in range(Nstars)]
-        self.posz = [[[] for y in range(Nfrag)] for x in range(Nstars)]
+        # Use the compiled galactic potential from _potential.c. Off by
+        # default: _potential.so is built by hand and is not rebuilt when
+        # _potential.c changes, so it may be out of date.
+        self.use_c_potential = False
+        # Fragment positions, one row per fragment and one column per
+        # output time; allocated when the integration starts. Row i holds
+        # rebound particle i + 1. Stored in kpc at single precision, which
+        # is ample for plotting and halves the memory of float64.
+        self.pos_dtype = np.float32
+        self.posx = None
+        self.posy = None
+        self.posz = None
+        self.step_idx = 0
         self.dmde = dMdEdist()
         self.forces = []
         self.star_masses = []
@@ -35,8 +45,14 @@ class RebSimIntegrator:
         self.orbital_vels = []
 
         # Star-fragment indices list, necessary to keep track of which
-        # particles in the simulation belong to which star.
-        self.sfindices = [0]
+        # particles in the simulation belong to which star. Kept sorted so
+        # it can be searched with np.searchsorted.
+        self.sfindices = np.zeros(1, dtype=np.int64)
+        # Star of each fragment, and that star's orbital_vels entry,
+        # indexed by particle index - 1; rebuilt from sfindices whenever
+        # fragments are added or removed.
+        self._flat_to_star = np.zeros(0, dtype=np.int64)
+        self._flat_orbital_vels = np.zeros(0)
 
     def set_Nstars(self, new_Nstars):
         self.Nstars = new_Nstars
@@ -47,28 +63,15 @@ class RebSimIntegrator:
     def set_Nout(self, new_Nout):
         self.Nout = new_Nout
 
+    def set_use_c_potential(self, new_use_c_potential):
+        self.use_c_potential = new_use_c_potential
+
     # Galaxy potential,
     # from http://adsabs.harvard.edu/abs/2014ApJ...793..122K
     # Note: There is a typo in that paper where "a_d" is said to be
     # 2750 kpc, it should be 2.75 kpc.
     def migrationAccel(self, reb_sim):
-        ps = reb_sim.contents.particles
-
-        # Apply forces to every fragment
-        for p in ps[1:]:
-            x2 = p.x**2
-            y2 = p.y**2
-            z2 = p.z**2
-            r = sqrt(x2 + y2 + z2)
-            rho2 = x2 + y2
-            zbd = sqrt(z2 + sc.bd**2)
-
-            p.ax += cluster_force(r, p.x) + bulge_force(r, p.x) +\
-                disk_force(r, p.x, rho2, zbd) + halo_force(r, p.x)
-            p.ay += cluster_force(r, p.y) + bulge_force(r, p.y) +\
-                disk_force(r, p.y, rho2, zbd) + halo_force(r, p.y)
-            p.az += cluster_force(r, p.z) + bulge_force(r, p.z) +\
-                disk_force(r, p.z, rho2, zbd) + halo_force(r, p.z)
+        add_galactic_accel(particle_array(reb_sim.contents)[1:])
 
     # Star disruption function
     def star_disrupt(self, reb_sim, time):
@@ -84,9 +87,7 @@ class RebSimIntegrator:
         self.star_radii.append(r_star)
 
         # Distance spread for fragments
-        rads = [r_star * float(f) / float(self.Nfrag + 1)
-                for f in range(self.Nfrag + 1)]
-        rads.pop(0)
+        rads = r_star * np.arange(1, self.Nfrag + 1) / (self.Nfrag + 1.0)
 
         # Determined tidal radius of star
         r_t = r_tidal(m_star, r_star)
@@ -97,10 +98,10 @@ class RebSimIntegrator:
         # Set position of star; random sphere point picking
         u1 = rnd.uniform(-1.0, 1.0)
         th1 = rnd.uniform(0., 2. * np.pi)
-        star_direc = np.array([sqrt(1.0 - (u1)**2) * cos(th1),
-                               sqrt(1.0 - (u1)**2) * sin(th1),
-                               u1])
-        star_vec = [r_t * d for d in star_direc]
+        dx = sqrt(1.0 - (u1)**2) * cos(th1)
+        dy = sqrt(1.0 - (u1)**2) * sin(th1)
+        dz = u1
+        star_direc = np.array([dx, dy, dz])
 
         # Binding energy spread, with beta value randomly drawn from
         # beta distribution
@@ -109,53 +110,52 @@ class RebSimIntegrator:
         NRGs = self.dmde.energy_spread(beta, self.Nfrag)
 
         # Converted NRGs list from cgs to proper units
-        natural_u = (u.AU / (u.yr / (2.0 * np.pi)))**2
         nrg_scale = ((r_star * sc.AUtoRsun)**(-1.0) * (m_star)**(2.0 / 3.0)
                      * (m_hole / 1.0e6)**(1.0 / 3.0))
-        energies = [(nrg_scale * nrg *
-                     (u.cm / u.second)**2).to(natural_u).value
-                    for nrg in NRGs]
+        energies = nrg_scale * sc.cgsv2tonatural * np.asarray(NRGs)
 
         # Calculating velocities
-        vels = [sqrt((2.0 * g) + (2.0 * m_hole / r_t)) for g in energies]
+        vels = np.sqrt(2.0 * energies + 2.0 * m_hole / r_t)
 
         # Randomly draw velocity vector direction
         phi2 = rnd.uniform(0., 2. * np.pi)
 
-        x = star_vec[0]
-        y = star_vec[1]
-        z = star_vec[2]
-        r = np.linalg.norm(star_vec)
-
-        randomvelvec = [
-            (x * (r - z + z * cos(phi2)) - r * y * sin(phi2)) /
-            (r**2 * sqrt(2.0 - 2.0 * z / r)),
-            (y * (r - z + z * cos(phi2)) + r * x * sin(phi2)) /
-            (r**2 * sqrt(2.0 - 2.0 * z / r)),
-            ((r - z) * z - (x**2 + y**2) * cos(phi2)) /
-            (r**2 * sqrt(2.0 - 2.0 * z / r))
-        ]
-
-        velocity_vec = np.cross(star_vec, randomvelvec)
-        n = np.linalg.norm(velocity_vec)
-        vel_direc = [v / n for v in velocity_vec]
-
-        for frag in tnrange(self.Nfrag, desc='Fragment', leave=False):
-
-            # Velocity vector of fragment
-            vel = vels[frag]
-            frag_velvec = [vel * v for v in vel_direc]
-
-            # Position vector of Fragment
-            rad = rads[frag]
-            frag_posvec = [(r_t + rad) * p for p in star_direc]
-
-            # Add particle to rebound simulation
-            reb_sim.add(m=0.0, x=frag_posvec[0], y=frag_posvec[1],
-                        z=frag_posvec[2], vx=frag_velvec[0],
-                        vy=frag_velvec[1], vz=frag_velvec[2])
-
-        self.sfindices.append(reb_sim.N - 1)
+        # Star position vector
+        x = r_t * dx
+        y = r_t * dy
+        z = r_t * dz
+        r = sqrt(x * x + y * y + z * z)
+
+        norm = r**2 * sqrt(2.0 - 2.0 * z / r)
+        rvx = (x * (r - z + z * cos(phi2)) - r * y * sin(phi2)) / norm
+        rvy = (y * (r - z + z * cos(phi2)) + r * x * sin(phi2)) / norm
+        rvz = ((r - z) * z - (x**2 + y**2) * cos(phi2)) / norm
+
+        # Same velocity direction for every fragment: the cross product
+        # of the star position and the random vector, normalised
+        vx = y * rvz - z * rvy
+        vy = z * rvx - x * rvz
+        vz = x * rvy - y * rvx
+        n = sqrt(vx * vx + vy * vy + vz * vz)
+        vel_direc = np.array([vx / n, vy / n, vz / n])
+
+        # Position and velocity vectors of fragments, shape (Nfrag, 3)
+        frag_posvec = (r_t + rads)[:, None] * star_direc
+        frag_velvec = vels[:, None] * vel_direc
+
+        # Build every fragment in a single particle buffer and add them
+        # to the rebound simulation together
+        frags = (rebound.Particle * self.Nfrag)()
+        fs = np.frombuffer(frags, dtype=particle_dtype)
+        fs['x'], fs['y'], fs['z'] = frag_posvec.T
+        fs['vx'], fs['vy'], fs['vz'] = frag_velvec.T
+
+        reb_sim.add(list(frags))
+
+        self.sfindices = np.append(self.sfindices, reb_sim.N - 1)
+        self._rebuild_index_maps()
+        if self.posx is not None:
+            self._grow(reb_sim.N - 1)
         print('Star disrupted, t= {0}'.format(time))
         print('Number of particles: {0}'.format(reb_sim.N))
         print(self.sfindices)
@@ -165,29 +165,44 @@ class RebSimIntegrator:
     # in the array of reb_sim particles
     def remove_fragment_record(self, particle_index):
         pi = particle_index
-        i = next(ind for ind, v in enumerate(self.sfindices)
-                 if v > pi or v == pi)
-        start = self.sfindices[i-1] + 1
-        new_pi = pi - start
-        star = i-1
-        self.posx[star].pop(new_pi)
-        self.posy[star].pop(new_pi)
-        self.posz[star].pop(new_pi)
-        for j, index in enumerate(self.sfindices[i:]):
-            self.sfindices[j+i] -= 1
+        i = int(np.searchsorted(self.sfindices, pi, side='left'))
+        # Shift the rows of the following live fragments up over the
+        # removed one; sfindices[-1] is the fragment count before removal
+        row = pi - 1
+        n = int(self.sfindices[-1])
+        for pos in (self.posx, self.posy, self.posz):
+            pos[row:n - 1] = pos[row + 1:n]
+            pos[n - 1] = np.nan
+        self.sfindices[i:] -= 1
+        self._rebuild_index_maps()
+
+    def _rebuild_index_maps(self):
+        counts = np.diff(self.sfindices)
+        self._flat_to_star = np.repeat(np.arange(counts.size), counts)
+        self._flat_orbital_vels = \
+            np.asarray(self.orbital_vels)[self._flat_to_star]
+
+    # Make room for at least new_rows fragments in posx, posy, and posz.
+    # The arrays are sized for Nstars * Nfrag fragments up front; should
+    # more be added they at least double, so growth stays amortised.
+    def _grow(self, new_rows):
+        rows, cols = self.posx.shape
+        if new_rows <= rows:
+            return
+        pad = np.full((max(new_rows, 2 * rows) - rows, cols), np.nan,
+                      dtype=self.pos_dtype)
+        self.posx = np.concatenate([self.posx, pad])
+        self.posy = np.concatenate([self.posy, pad])
+        self.posz = np.concatenate([self.posz, pad])
 
     # Record the position of each fragment
     def record_fragment_positions(self, reb_sim):
-        for pi, p in enumerate(reb_sim.particles):
-            if pi == 0:
-                continue
-            i = next(ind for ind, v in enumerate(self.sfindices)
-                     if v > pi or v == pi)
-            frag = pi - self.sfindices[i-1] - 1
-            star = i - 1
-            self.posx[star][frag].append(p.x / sc.scale)
-            self.posy[star][frag].append(p.y / sc.scale)
-            self.posz[star][frag].append(p.z / sc.scale)
+        ps = particle_array(reb_sim)[1:]
+        n = ps.size
+        self.posx[:n, self.step_idx] = ps['x'] / sc.scale
+        self.posy[:n, self.step_idx] = ps['y'] / sc.scale
+        self.posz[:n, self.step_idx] = ps['z'] / sc.scale
+        self.step_idx += 1
 
     # Integrating simulation
     def sim_integrate(self):
@@ -198,70 +213,71 @@ class RebSimIntegrator:
         reb_sim.dt = 1.0e-15
 
         reb_sim.N_active = 1
-        reb_sim.additional_forces = self.migrationAccel
+        c_accel = c_migration_accel() if self.use_c_potential else None
+        if self.use_c_potential and c_accel is None:
+            print('Compiled galactic potential unavailable, '
+                  'build _potential.so from _potential.c.')
+        if c_accel is not None:
+            reb_sim.additional_forces = c_accel
+            print('Galactic potential backend: C (_potential.so)')
+        else:
+            reb_sim.additional_forces = self.migrationAccel
+            print('Galactic potential backend: {0}'.format(
+                galactic_accel_backend()))
         reb_sim.force_is_velocity_dependent = 1
         reb_sim.exit_max_distance = 15.0 * sc.scale  # 15 pc in AU
 
         stop = np.log10(self.max_time)
         times = np.logspace(-17.0, stop, self.Nout - 1)
-        times = np.insert(times, 0.0, 0)
-        epsilon = 0.1 * (1.0e4 * 2 * np.pi)
-        bound_vel = ((500 * u.km / u.second).
-                     to(u.AU/(u.yr / (2.0 * np.pi))).value)
+        times = np.insert(times, 0, 0.0)
+
+        # Output steps at which to disrupt the following stars, one every
+        # 10,000 years
+        disrupt_times = np.arange(1, self.Nstars) * 1.0e4 * 2.0 * np.pi
+        disrupts = np.bincount(np.searchsorted(times, disrupt_times,
+                                               side='right'),
+                               minlength=times.size + 1)
+        bound_vel = 500.0 * sc.kmstonatural
+
+        # Fragment position records, NaN until a fragment exists
+        shape = (self.Nstars * self.Nfrag, self.Nout)
+        self.posx = np.full(shape, np.nan, dtype=self.pos_dtype)
+        self.posy = np.full(shape, np.nan, dtype=self.pos_dtype)
+        self.posz = np.full(shape, np.nan, dtype=self.pos_dtype)
+        self.step_idx = 0
 
         # Disrupt first star
         self.star_disrupt(reb_sim, reb_sim.t)
-        star_count = 1
 
         # Begin integration
         for ti, time in enumerate(tqdm(times)):
             try:
                 reb_sim.integrate(time, exact_finish_time=1)
-
-                # Add new disruption every 10,000 years
-                if (time % (1.0e4 * 2 * np.pi) < epsilon and
-                        time > (1.0e4 * 2 * np.pi) and
-                        star_count != self.Nstars):
-                    self.star_disrupt(reb_sim, reb_sim.t)
-                    star_count += 1
-
-                # Bound velocity criterion:
-                # Cuts particles closely bound to black hole
-                for index in range(reb_sim.N):
-                    if index == 0:
-                        continue
-                    try:
-                        p = reb_sim.particles[index]
-                        star = next(ind for ind, v in enumerate(self.sfindices)
-                                    if v > index or v == index) - 1
-                        velinf2 = np.absolute(p.vx**2 + p.vy**2 + p.vz**2 -
-                                              self.orbital_vels[star])
-                        velinf = sqrt(velinf2)
-                        if velinf < bound_vel:
-                            reb_sim.remove(index)
-                            self.remove_fragment_record(index)
-                            print('Bound particle removed.')
-                            raise StopIteration
-                    except StopIteration:
-                        # print('Particle index: {0}'.format(index))
-                        # print('Number of particles: {0}'.format(reb_sim.N))
-                        # print(self.sfindices)
-                        # reb_sim.status()
-                        # sys.exit()
-                        break
-
             except rebound.Escape:  # Removes escaped particles
                 print('A particle has escaped.')
-                for j in range(reb_sim.N):
-                    try:
-                        p = reb_sim.particles[j]
-                        d2 = p.x * p.x + p.y * p.y + p.z * p.z
-                        if d2 > reb_sim.exit_max_distance**2:
-                            reb_sim.remove(j)
-                            self.remove_fragment_record(j)
-                            raise StopIteration
-                    except StopIteration:
-                        break
+                ps = particle_array(reb_sim)[1:]
+                d2 = ps['x']**2 + ps['y']**2 + ps['z']**2
+                escaped = d2 > reb_sim.exit_max_distance**2
+                if escaped.any():
+                    index = int(escaped.argmax()) + 1
+                    reb_sim.remove(index)
+                    self.remove_fragment_record(index)
+
+            # Add new disruption every 10,000 years
+            for d in range(disrupts[ti]):
+                self.star_disrupt(reb_sim, reb_sim.t)
+
+            # Bound velocity criterion:
+            # Cuts particles closely bound to black hole
+            ps = particle_array(reb_sim)[1:]
+            velinf2 = np.absolute(ps['vx']**2 + ps['vy']**2 + ps['vz']**2 -
+                                  self._flat_orbital_vels)
+            bound = velinf2 < bound_vel**2
+            if bound.any():
+                index = int(bound.argmax()) + 1
+                reb_sim.remove(index)
+                self.remove_fragment_record(index)
+                print('Bound particle removed.')
 
             # Recording positions of fragments
             self.record_fragment_positions(reb_sim)